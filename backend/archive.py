@@ -0,0 +1,97 @@
+"""Scheduled batch job moving old Done cards into the archive"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Collection, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from backend import crud
+from backend.sharding import migrating_user_ids, register_writer
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_archive_policy(
+    db: Session,
+    after_days: int,
+    batch_size: int,
+    exclude_user_ids: Collection[int] = ()
+) -> int:
+    """Archive every Done card untouched for more than `after_days` days"""
+    cutoff = datetime.utcnow() - timedelta(days=after_days)
+    return crud.archive_done_cards(db, cutoff, batch_size, exclude_user_ids)
+
+
+class ArchiveScheduler:
+    """Background thread running the archive policy on every shard each `interval` seconds.
+
+    The first session factory must be the main database, where each run
+    registers as a writer so shard migrations wait for it.
+    """
+
+    def __init__(
+        self,
+        session_factories: List[Callable[[], Session]],
+        after_days: int,
+        batch_size: int,
+        interval: float,
+    ):
+        self.session_factories = session_factories
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the scheduler thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="archive-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Signal the scheduler thread to exit and wait for it"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self) -> int:
+        """Run the archive policy once on every shard, skipping users being migrated"""
+        primary = self.session_factories[0]()
+        try:
+            with register_writer(primary, None):
+                migrating = migrating_user_ids(primary)
+                return sum(
+                    self._archive_shard(session_factory, migrating)
+                    for session_factory in self.session_factories
+                )
+        except SQLAlchemyError:
+            logger.exception("Archive run failed")
+            return 0
+        finally:
+            primary.close()
+
+    def _archive_shard(self, session_factory: Callable[[], Session], exclude_user_ids: Collection[int]) -> int:
+        db = session_factory()
+        try:
+            return run_archive_policy(db, self.after_days, self.batch_size, exclude_user_ids)
+        except SQLAlchemyError:
+            # Another worker may be archiving the same batch; retry next run
+            db.rollback()
+            logger.exception("Archive run failed")
+            return 0
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            archived = self.run_once()
+            if archived:
+                logger.info("Archived %d cards", archived)
+            self._stop.wait(self.interval)
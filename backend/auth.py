@@ -54,11 +54,15 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> models.User:
-    """Get the current authenticated user from JWT token"""
+    """Get the current authenticated user from JWT token.
+
+    Sync so the user lookup runs in the threadpool; waiting on the
+    connection pool must never block the event loop.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -1,16 +1,31 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
     """Application settings"""
 
     # Database settings
+    DB_BACKEND: str = "mysql"  # "mysql" or "sqlite"
     DB_USER: str = "kanban_user"
     DB_PASSWORD: str = "kanban_password"
     DB_HOST: str = "localhost"
     DB_PORT: int = 3306
     DB_NAME: str = "kanban_db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+
+    # SQLite settings (used when DB_BACKEND is "sqlite")
+    SQLITE_PATH: str = "kanban.db"
+    SQLITE_READ_POOL_SIZE: int = 40  # AnyIO's default threadpool size
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Sharding settings: comma-separated URLs of extra shards for boards and cards.
+    # The main database is always shard 0 and keeps users and the shard directory.
+    SHARD_URLS: str = ""
 
     # Application settings
     APP_NAME: str = "Personal Kanban Board"
@@ -21,11 +36,48 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Export/import settings
+    EXPORT_BATCH_SIZE: int = 1000
+    IMPORT_BATCH_SIZE: int = 1000
+
+    # Archive settings
+    ARCHIVE_ENABLED: bool = False  # opt-in until the UI can show and restore archived cards
+    ARCHIVE_AFTER_DAYS: int = 30
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_INTERVAL_MINUTES: int = 60
+
+    # Background job settings
+    JOBS_ENABLED: bool = True
+    JOB_WORKERS: int = 4
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0
+    JOB_LEASE_SECONDS: int = 60
+
+    # Request coalescing settings for concurrent identical board reads
+    SINGLEFLIGHT_ENABLED: bool = True
+    SINGLEFLIGHT_TIMEOUT_SECONDS: float = 5.0
+
+    # Rate limiting settings (requests per minute per user, or per IP for auth)
+    # 0 disables a limit
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"  # or "package.module:ClassName"
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 10
+    RATE_LIMIT_READ_PER_MINUTE: int = 600
+    RATE_LIMIT_WRITE_PER_MINUTE: int = 120
+    MAX_CONCURRENT_REQUESTS: Optional[int] = None  # None follows the database pool size
+
     @property
     def DATABASE_URL(self) -> str:
         """Construct database URL"""
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite:///{self.SQLITE_PATH}"
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def SHARD_URL_LIST(self) -> List[str]:
+        """Parse the extra shard URLs"""
+        return [url.strip() for url in self.SHARD_URLS.split(",") if url.strip()]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
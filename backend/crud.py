@@ -1,9 +1,33 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import case, func, insert, delete, select, or_
+from typing import Collection, Iterable, Iterator, List, Optional
+from datetime import datetime
 
 from backend import models, schemas
 from backend.auth import get_password_hash
+from backend.sharding import shard_router
+from backend.singleflight import Versions
+
+
+# Committed board and card writes per user, part of coalesced read keys so
+# a read never joins one that started before the user's last write. Kept
+# per user since making a board the default also changes the others.
+user_versions = Versions()
+
+
+# Column order of a board. MariaDB's native ENUM sorts this way by itself,
+# but SQLite stores the status as a VARCHAR of names that sorts alphabetically
+STATUS_ORDER = case(
+    *[(models.Card.status == status, position) for position, status in enumerate(models.CardStatus)]
+)
+
+
+def _new_id(model) -> Optional[int]:
+    """Allocate an id for a new board or card (None means autoincrement).
+
+    Must run before the session writes anything, see ShardRouter.allocate_ids.
+    """
+    return shard_router.allocate_ids(model.__tablename__)[0]
 
 
 # User CRUD operations
@@ -28,19 +52,23 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    return db_user
+
 
-    # Create a default board for the new user
+def create_default_board(db: Session, user_id: int) -> models.Board:
+    """Create the default board for a new user on the user's shard"""
     default_board = models.Board(
+        id=_new_id(models.Board),
         name="My Kanban Board",
         description="Default board",
         color="#667eea",
         is_default=True,
-        user_id=db_user.id
+        user_id=user_id
     )
     db.add(default_board)
     db.commit()
-
-    return db_user
+    db.refresh(default_board)
+    return default_board
 
 
 # Board CRUD operations
@@ -72,6 +100,8 @@ def get_default_board(db: Session, user_id: int) -> Optional[models.Board]:
 
 def create_board(db: Session, board: schemas.BoardCreate, user_id: int) -> models.Board:
     """Create a new board for a specific user"""
+    board_id = _new_id(models.Board)
+
     # If this board is marked as default, unset other default boards
     if board.is_default:
         db.query(models.Board).filter(
@@ -79,9 +109,10 @@ def create_board(db: Session, board: schemas.BoardCreate, user_id: int) -> model
             models.Board.is_default == True
         ).update({"is_default": False})
 
-    db_board = models.Board(**board.model_dump(), user_id=user_id)
+    db_board = models.Board(**board.model_dump(), id=board_id, user_id=user_id)
     db.add(db_board)
     db.commit()
+    user_versions.bump(user_id)
     db.refresh(db_board)
     return db_board
 
@@ -106,23 +137,38 @@ def update_board(db: Session, board_id: int, board: schemas.BoardUpdate, user_id
         setattr(db_board, field, value)
 
     db.commit()
+    user_versions.bump(user_id)
     db.refresh(db_board)
     return db_board
 
 
-def delete_board(db: Session, board_id: int, user_id: int) -> bool:
-    """Delete a board for a specific user"""
-    db_board = get_board(db, board_id, user_id)
-    if db_board is None:
+def can_delete_board(db: Session, board_id: int, user_id: int) -> bool:
+    """Check that a board exists for the user and is not their last one"""
+    if get_board(db, board_id, user_id) is None:
         return False
 
     # Don't allow deletion of the last board
     board_count = db.query(models.Board).filter(models.Board.user_id == user_id).count()
-    if board_count <= 1:
+    return board_count > 1
+
+
+def delete_board(db: Session, board_id: int, user_id: int) -> bool:
+    """Delete a board for a specific user"""
+    if not can_delete_board(db, board_id, user_id):
         return False
 
-    db.delete(db_board)
+    # Bulk delete rather than loading every card for the ORM cascade
+    db.query(models.Card).filter(
+        models.Card.board_id == board_id
+    ).delete(synchronize_session=False)
+    db.query(models.ArchivedCard).filter(
+        models.ArchivedCard.board_id == board_id
+    ).delete(synchronize_session=False)
+    db.query(models.Board).filter(
+        models.Board.id == board_id
+    ).delete(synchronize_session=False)
     db.commit()
+    user_versions.bump(user_id)
     return True
 
 
@@ -154,7 +200,7 @@ def get_cards(db: Session, board_id: int, user_id: int, skip: int = 0, limit: in
     return db.query(models.Card).filter(
         models.Card.board_id == board_id
     ).order_by(
-        models.Card.status,
+        STATUS_ORDER,
         models.Card.priority.desc(),
         models.Card.created_at
     ).offset(skip).limit(limit).all()
@@ -176,9 +222,10 @@ def create_card(db: Session, card: schemas.CardCreate, board_id: int, user_id: i
     if not board:
         return None
 
-    db_card = models.Card(**card.model_dump(), board_id=board_id)
+    db_card = models.Card(**card.model_dump(), id=_new_id(models.Card), board_id=board_id)
     db.add(db_card)
     db.commit()
+    user_versions.bump(user_id)
     db.refresh(db_card)
     return db_card
 
@@ -194,6 +241,7 @@ def update_card(db: Session, card_id: int, card: schemas.CardUpdate, user_id: in
         setattr(db_card, field, value)
 
     db.commit()
+    user_versions.bump(user_id)
     db.refresh(db_card)
     return db_card
 
@@ -206,4 +254,150 @@ def delete_card(db: Session, card_id: int, user_id: int) -> bool:
 
     db.delete(db_card)
     db.commit()
+    user_versions.bump(user_id)
     return True
+
+
+def iter_board_cards(db: Session, board_id: int, batch_size: int = 1000) -> Iterator[models.Card]:
+    """Stream all cards of a board through a server-side cursor.
+
+    Rows are fetched `batch_size` at a time so memory stays constant
+    regardless of board size. Ownership must be checked by the caller.
+    """
+    query = db.query(models.Card).filter(
+        models.Card.board_id == board_id
+    ).order_by(
+        models.Card.id
+    ).yield_per(batch_size)
+
+    for card in query:
+        yield card
+
+
+def bulk_create_cards(
+    db: Session,
+    cards: Iterable[schemas.CardCreate],
+    board_id: int,
+    batch_size: int = 1000
+) -> int:
+    """Insert cards into a board in chunked bulk INSERTs, returning the count.
+
+    Each chunk is committed on its own so a large import never holds one
+    huge transaction. Ownership must be checked by the caller.
+    """
+    created = 0
+    batch = []
+    for card in cards:
+        batch.append({**card.model_dump(), "board_id": board_id})
+        if len(batch) >= batch_size:
+            _insert_cards(db, batch)
+            created += len(batch)
+            batch = []
+
+    if batch:
+        _insert_cards(db, batch)
+        created += len(batch)
+
+    return created
+
+
+def _insert_cards(db: Session, rows: List[dict]) -> None:
+    """Bulk insert and commit card rows"""
+    card_ids = shard_router.allocate_ids(models.Card.__tablename__, len(rows))
+    if card_ids[0] is not None:
+        rows = [{**row, "id": card_id} for row, card_id in zip(rows, card_ids)]
+    db.execute(insert(models.Card), rows)
+    db.commit()
+
+
+# Archive operations
+# Columns shared by cards and archived_cards, copied as-is when moving rows
+CARD_COLUMNS = ["id", "title", "description", "status", "priority", "board_id", "created_at", "updated_at"]
+
+
+def archive_done_cards(
+    db: Session,
+    older_than: datetime,
+    batch_size: int = 500,
+    exclude_user_ids: Collection[int] = ()
+) -> int:
+    """Move Done cards last touched before `older_than` into archived_cards.
+
+    Cards are moved in batches, each committed on its own, so the job never
+    holds long locks on the cards table. Cards of `exclude_user_ids` are
+    left alone. Returns the number of cards moved.
+    """
+    conditions = [
+        models.Card.status == models.CardStatus.DONE,
+        func.coalesce(models.Card.updated_at, models.Card.created_at) < older_than,
+    ]
+    if exclude_user_ids:
+        conditions.append(models.Card.board_id.notin_(
+            select(models.Board.id).where(models.Board.user_id.in_(exclude_user_ids))
+        ))
+
+    archived = 0
+    while True:
+        card_ids = db.execute(
+            select(models.Card.id).where(*conditions).order_by(models.Card.id).limit(batch_size)
+        ).scalars().all()
+        if not card_ids:
+            return archived
+
+        db.execute(insert(models.ArchivedCard).from_select(
+            CARD_COLUMNS,
+            select(*[getattr(models.Card, c) for c in CARD_COLUMNS]).where(models.Card.id.in_(card_ids))
+        ))
+        db.execute(delete(models.Card).where(models.Card.id.in_(card_ids)))
+        db.commit()
+        archived += len(card_ids)
+
+
+def get_archived_cards(
+    db: Session,
+    board_id: int,
+    user_id: int,
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> Optional[List[models.ArchivedCard]]:
+    """Get archived cards for a specific board, optionally matching a search term"""
+    # Verify the board belongs to the user
+    board = get_board(db, board_id, user_id)
+    if not board:
+        return None
+
+    query = db.query(models.ArchivedCard).filter(models.ArchivedCard.board_id == board_id)
+    if search:
+        # Match the term literally, not % and _ as wildcards
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        query = query.filter(or_(
+            models.ArchivedCard.title.ilike(pattern, escape="\\"),
+            models.ArchivedCard.description.ilike(pattern, escape="\\")
+        ))
+
+    return query.order_by(
+        models.ArchivedCard.archived_at.desc(),
+        models.ArchivedCard.id.desc()
+    ).offset(skip).limit(limit).all()
+
+
+def restore_card(db: Session, card_id: int, user_id: int) -> Optional[models.Card]:
+    """Move an archived card back into its board, ensuring it belongs to the user"""
+    archived_card = db.query(models.ArchivedCard).join(models.Board).filter(
+        models.ArchivedCard.id == card_id,
+        models.Board.user_id == user_id
+    ).first()
+    if archived_card is None:
+        return None
+
+    db_card = models.Card(**{c: getattr(archived_card, c) for c in CARD_COLUMNS})
+    # Touch the card so the archive policy doesn't move it straight back
+    db_card.updated_at = func.now()
+    db.delete(archived_card)
+    db.add(db_card)
+    db.commit()
+    user_versions.bump(user_id)
+    db.refresh(db_card)
+    return db_card
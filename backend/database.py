@@ -1,20 +1,118 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.dml import UpdateBase
 
 from backend.config import get_settings
 
 settings = get_settings()
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
+
+# AnyIO's default worker thread count, which runs every sync endpoint
+THREADPOOL_SIZE = 40
+
+
+def make_engine(url: str):
+    """Create a database engine with the application's pool settings"""
+    return create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+
+
+def pool_capacity() -> int:
+    """Connections requests can hold at once, capped by the threadpool"""
+    if settings.DB_BACKEND == "sqlite":
+        capacity = settings.SQLITE_READ_POOL_SIZE
+    else:
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return min(capacity, THREADPOOL_SIZE)
+
+
+def _set_sqlite_pragmas(engine, query_only: bool = False) -> None:
+    """Apply WAL journaling and tuned pragmas to every new SQLite connection"""
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+class SQLiteSession(Session):
+    """Session sending writes to the single writer connection and reads to the read pool"""
+
+    _writing = False
+
+    def execute(self, statement, *args, **kwargs):
+        # ORM bulk INSERT/UPDATE asks for a bind by mapper only, so flag
+        # DML statements for the duration of their execution
+        if not isinstance(statement, UpdateBase):
+            return super().execute(statement, *args, **kwargs)
+        self._writing = True
+        try:
+            return super().execute(statement, *args, **kwargs)
+        finally:
+            self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or self._writing or isinstance(clause, UpdateBase):
+            return self.bind
+        return self.info["reader"]
+
+
+def make_sessionmaker(url: str) -> sessionmaker:
+    """Create a session factory for a database URL.
+
+    SQLite files get a single serialized writer connection plus a pool of
+    read-only connections; WAL lets the readers run alongside the writer.
+    """
+    if not url.startswith("sqlite"):
+        return sessionmaker(autocommit=False, autoflush=False, bind=make_engine(url))
+
+    connect_args = {"check_same_thread": False}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # An in-memory database only exists on its one connection
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    _set_sqlite_pragmas(writer)
+    # One reader per request thread, plus headroom for the background
+    # archive and job threads; requests never hold more than one reader
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=10,
+    )
+    _set_sqlite_pragmas(reader, query_only=True)
+    return sessionmaker(
+        class_=SQLiteSession,
+        autocommit=False,
+        autoflush=False,
+        bind=writer,
+        info={"reader": reader},
+    )
+
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = make_sessionmaker(settings.DATABASE_URL)
+
+# Create database engine (the writer for SQLite)
+engine = SessionLocal.kw["bind"]
 
 # Create base class for models
 Base = declarative_base()
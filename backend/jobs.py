@@ -0,0 +1,360 @@
+"""In-process background job runner backed by a durable queue table"""
+import logging
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend import crud, models
+from backend.sharding import UserMigrating, shard_router, user_write
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobType:
+    """A registered job handler with its limits"""
+    handler: Callable[[dict], Optional[dict]]
+    concurrency: int
+    max_attempts: int
+
+
+# Registered job types by name
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help; the job fails with this message"""
+
+
+class RetryLater(Exception):
+    """Raised by a handler to run the job again after `delay` seconds without using up an attempt.
+
+    A `delay` of None waits the runner's retry backoff.
+    """
+
+    def __init__(self, message: str, delay: Optional[float] = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+def job(name: str, concurrency: int = 1, max_attempts: int = 3):
+    """Register a function as the handler for a job type"""
+    def register(handler: Callable[[dict], Optional[dict]]):
+        JOB_TYPES[name] = JobType(handler, concurrency, max_attempts)
+        return handler
+    return register
+
+
+def enqueue(
+    db: Session,
+    job_type: str,
+    payload: dict,
+    user_id: Optional[int] = None,
+    priority: int = 0
+) -> models.Job:
+    """Add a job to the queue"""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type {job_type}")
+
+    db_job = models.Job(
+        type=job_type,
+        payload=payload,
+        priority=priority,
+        max_attempts=JOB_TYPES[job_type].max_attempts,
+        user_id=user_id,
+        run_after=datetime.utcnow(),
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: int, user_id: int) -> Optional[models.Job]:
+    """Get a job by ID, ensuring it belongs to the user"""
+    return db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.user_id == user_id
+    ).first()
+
+
+class JobRunner:
+    """Dispatcher thread claiming queued jobs and running them on a thread pool.
+
+    Jobs are claimed with a conditional UPDATE, so several app processes
+    can share one queue. Higher priority jobs run first, each job type
+    runs at most `concurrency` jobs at once in this process, and failed
+    jobs are retried with exponential backoff up to `max_attempts`.
+
+    A claimed job holds a lease kept alive by the dispatcher's heartbeat.
+    Jobs whose lease expired, because their process died, are requeued,
+    or failed once they have used up their attempts.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int,
+        poll_interval: float,
+        retry_backoff: float,
+        lease: timedelta,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.lease = lease
+        self._running: Dict[str, int] = defaultdict(int)
+        self._claimed: Set[int] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether this process is dispatching jobs"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the dispatcher thread and worker pool"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+        self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop dispatching and wait for running jobs to finish"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def notify(self) -> None:
+        """Wake the dispatcher after a job was enqueued"""
+        self._wakeup.set()
+
+    def heartbeat(self) -> None:
+        """Renew the lease on the jobs this process is running"""
+        with self._lock:
+            job_ids = list(self._claimed)
+        if not job_ids:
+            return
+
+        db = self.session_factory()
+        try:
+            db.query(models.Job).filter(
+                models.Job.id.in_(job_ids),
+                models.Job.status == models.JobStatus.RUNNING
+            ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def recover_expired(self) -> int:
+        """Requeue or fail running jobs whose lease expired, returning how many"""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            expired = db.query(models.Job).filter(
+                models.Job.status == models.JobStatus.RUNNING,
+                func.coalesce(models.Job.heartbeat_at, models.Job.started_at) < now - self.lease
+            )
+            failed = expired.filter(
+                models.Job.attempts >= models.Job.max_attempts
+            ).update({
+                "status": models.JobStatus.FAILED,
+                "error": "Job lease expired",
+                "finished_at": now,
+            }, synchronize_session=False)
+            requeued = expired.update({
+                "status": models.JobStatus.QUEUED,
+                "run_after": now,
+            }, synchronize_session=False)
+            db.commit()
+            return failed + requeued
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        # Renew leases well before they can expire
+        maintenance_interval = self.lease.total_seconds() / 3
+        next_maintenance = 0.0
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            if time.monotonic() >= next_maintenance:
+                try:
+                    self.heartbeat()
+                    recovered = self.recover_expired()
+                    if recovered:
+                        logger.warning("Recovered %d jobs with an expired lease", recovered)
+                except Exception:
+                    logger.exception("Job lease maintenance failed")
+                next_maintenance = time.monotonic() + maintenance_interval
+
+            try:
+                claimed = self._dispatch()
+            except Exception:
+                logger.exception("Job dispatch failed")
+                claimed = False
+            if not claimed:
+                self._wakeup.wait(min(self.poll_interval, max(0.0, next_maintenance - time.monotonic())))
+
+    def _available_types(self):
+        """Job types below their concurrency limit, or None if all workers are busy"""
+        with self._lock:
+            if sum(self._running.values()) >= self.workers:
+                return None
+            return [
+                name for name, job_type in JOB_TYPES.items()
+                if self._running[name] < job_type.concurrency
+            ]
+
+    def _dispatch(self) -> bool:
+        """Claim one runnable job and hand it to the pool"""
+        available = self._available_types()
+        if not available:
+            return False
+
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db_job = db.query(models.Job).filter(
+                models.Job.status == models.JobStatus.QUEUED,
+                models.Job.run_after <= now,
+                models.Job.type.in_(available)
+            ).order_by(
+                models.Job.priority.desc(),
+                models.Job.id
+            ).first()
+            if db_job is None:
+                return False
+            job_id, job_type, payload = db_job.id, db_job.type, db_job.payload
+            attempt, max_attempts = db_job.attempts + 1, db_job.max_attempts
+
+            claimed = db.query(models.Job).filter(
+                models.Job.id == job_id,
+                models.Job.status == models.JobStatus.QUEUED,
+                models.Job.attempts == attempt - 1
+            ).update({
+                "status": models.JobStatus.RUNNING,
+                "attempts": models.Job.attempts + 1,
+                "started_at": now,
+                "heartbeat_at": now,
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                # Another process got it first, look again right away
+                return True
+        finally:
+            db.close()
+
+        with self._lock:
+            self._running[job_type] += 1
+            self._claimed.add(job_id)
+        self._executor.submit(self._execute, job_id, job_type, payload, attempt, max_attempts)
+        return True
+
+    def _execute(self, job_id: int, job_type: str, payload: dict, attempt: int, max_attempts: int) -> None:
+        """Run a claimed job and record its outcome"""
+        try:
+            self._run_handler(job_id, job_type, payload, attempt, max_attempts)
+        finally:
+            with self._lock:
+                self._running[job_type] -= 1
+                self._claimed.discard(job_id)
+            self._wakeup.set()
+
+    def _run_handler(self, job_id: int, job_type: str, payload: dict, attempt: int, max_attempts: int) -> None:
+        try:
+            result = JOB_TYPES[job_type].handler(payload)
+            outcome = {
+                "status": models.JobStatus.SUCCEEDED,
+                "result": result,
+                "error": None,
+                "finished_at": datetime.utcnow(),
+            }
+        except RetryLater as exc:
+            logger.info("Job %d (%s) deferred: %s", job_id, job_type, exc)
+            delay = self.retry_backoff if exc.delay is None else exc.delay
+            outcome = {
+                "status": models.JobStatus.QUEUED,
+                # Waiting doesn't use up an attempt
+                "attempts": attempt - 1,
+                "error": str(exc),
+                "run_after": datetime.utcnow() + timedelta(seconds=delay),
+            }
+        except PermanentJobError as exc:
+            logger.warning("Job %d (%s) failed: %s", job_id, job_type, exc)
+            outcome = {
+                "status": models.JobStatus.FAILED,
+                "error": str(exc),
+                "finished_at": datetime.utcnow(),
+            }
+        except Exception:
+            logger.exception("Job %d (%s) failed", job_id, job_type)
+            error, now = traceback.format_exc(limit=5), datetime.utcnow()
+            if attempt < max_attempts:
+                outcome = {
+                    "status": models.JobStatus.QUEUED,
+                    "error": error,
+                    "run_after": now + timedelta(seconds=self.retry_backoff * 2 ** (attempt - 1)),
+                }
+            else:
+                outcome = {
+                    "status": models.JobStatus.FAILED,
+                    "error": error,
+                    "finished_at": now,
+                }
+
+        db = self.session_factory()
+        try:
+            # Only record the outcome if the lease wasn't lost to recovery meanwhile
+            recorded = db.query(models.Job).filter(
+                models.Job.id == job_id,
+                models.Job.status == models.JobStatus.RUNNING,
+                models.Job.attempts == attempt
+            ).update(outcome, synchronize_session=False)
+            db.commit()
+            if not recorded:
+                logger.warning("Job %d (%s) lost its lease, outcome discarded", job_id, job_type)
+        finally:
+            db.close()
+
+
+# Job handlers
+@job("delete_board", concurrency=2)
+def delete_board_job(payload: dict) -> dict:
+    """Delete a board and all of its cards, waiting out shard migrations of its user"""
+    primary_db = shard_router.session(0)
+    try:
+        with user_write(primary_db, payload["user_id"]) as shard_id:
+            db = shard_router.session(shard_id)
+            try:
+                if crud.get_board(db, payload["board_id"], payload["user_id"]) is None:
+                    raise PermanentJobError("Board not found")
+                if not crud.delete_board(db, payload["board_id"], payload["user_id"]):
+                    raise PermanentJobError("Cannot delete the user's last board")
+                return {"deleted": True}
+            finally:
+                db.close()
+    except UserMigrating:
+        raise RetryLater("User is being moved between shards")
+    finally:
+        primary_db.close()
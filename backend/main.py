@@ -1,14 +1,18 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, status
+from fastapi import FastAPI, Request, Depends, HTTPException, status, File, Query, UploadFile
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, List, Optional
 from datetime import timedelta
+import io
 
-from backend import models, schemas, crud
-from backend.database import engine, get_db
+from backend import models, schemas, crud, transfer, jobs
+from backend.archive import ArchiveScheduler
+from backend.database import engine, get_db, pool_capacity, SessionLocal
+from backend.sharding import shard_router, get_shard_db
 from backend.auth import (
     get_current_active_user,
     verify_password,
@@ -16,14 +20,98 @@ from backend.auth import (
     get_password_hash
 )
 from backend.config import get_settings
+from backend.ratelimit import RateLimit, RateLimitMiddleware, load_store
+from backend.singleflight import SingleFlight
 
 settings = get_settings()
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+shard_router.create_all()
 
 app = FastAPI(title="Personal Kanban Board")
 
+# Coalesce identical concurrent board reads into one query and payload
+board_reads = SingleFlight(timeout=settings.SINGLEFLIGHT_TIMEOUT_SECONDS)
+card_list_adapter = TypeAdapter(List[schemas.Card])
+
+
+def coalesced_read(request: Request, user_id: int, load: Callable[[], bytes]) -> Response:
+    """Serve a JSON read, sharing it with identical in-flight requests"""
+    if settings.SINGLEFLIGHT_ENABLED:
+        key = (
+            request.url.path,
+            user_id,
+            crud.user_versions.get(user_id),
+            tuple(sorted(request.query_params.multi_items())),
+        )
+        payload = board_reads.do(key, load)
+    else:
+        payload = load()
+    return Response(content=payload, media_type="application/json")
+
+
+# Periodically move old Done cards out of the working set
+archive_scheduler = ArchiveScheduler(
+    shard_router.sessionmakers,
+    after_days=settings.ARCHIVE_AFTER_DAYS,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    interval=settings.ARCHIVE_INTERVAL_MINUTES * 60,
+)
+
+
+@app.on_event("startup")
+def start_archive_scheduler():
+    """Start the archive batch job"""
+    if settings.ARCHIVE_ENABLED:
+        archive_scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_archive_scheduler():
+    """Stop the archive batch job"""
+    archive_scheduler.stop()
+
+
+# Run deferred heavy work off the request path
+job_runner = jobs.JobRunner(
+    SessionLocal,
+    workers=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    retry_backoff=settings.JOB_RETRY_BACKOFF_SECONDS,
+    lease=timedelta(seconds=settings.JOB_LEASE_SECONDS),
+)
+
+
+@app.on_event("startup")
+def start_job_runner():
+    """Start the background job runner"""
+    if settings.JOBS_ENABLED:
+        job_runner.start()
+
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    """Stop the background job runner"""
+    job_runner.stop()
+
+# Add rate limiting and admission control (wrapped by CORS below)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limits={
+            "auth": RateLimit(settings.RATE_LIMIT_AUTH_PER_MINUTE),
+            "read": RateLimit(settings.RATE_LIMIT_READ_PER_MINUTE),
+            "write": RateLimit(settings.RATE_LIMIT_WRITE_PER_MINUTE),
+        },
+        store=load_store(settings.RATE_LIMIT_STORE),
+        # Shed load before requests start queueing for database connections
+        max_concurrent=(
+            pool_capacity() if settings.MAX_CONCURRENT_REQUESTS is None
+            else settings.MAX_CONCURRENT_REQUESTS
+        ),
+    )
+
 # Add CORS middleware for security
 app.add_middleware(
     CORSMiddleware,
@@ -88,8 +176,17 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
 
-    # Create new user
-    return crud.create_user(db, user)
+    # Create new user and place their boards on a shard
+    db_user = crud.create_user(db, user)
+    shard_id = shard_router.assign_user(db, db_user)
+
+    shard_db = shard_router.session(shard_id)
+    try:
+        crud.create_default_board(shard_db, db_user.id)
+    finally:
+        shard_db.close()
+
+    return db_user
 
 
 @app.post("/api/auth/login", response_model=schemas.Token)
@@ -137,7 +234,7 @@ async def get_me(current_user: models.User = Depends(get_current_active_user)):
 # Board API Endpoints (Protected)
 @app.get("/api/boards", response_model=List[schemas.Board])
 def get_boards(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get all boards for the current user"""
@@ -148,20 +245,24 @@ def get_boards(
 @app.get("/api/boards/{board_id}", response_model=schemas.BoardWithStats)
 def get_board(
     board_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get a specific board with statistics"""
-    board = crud.get_board_with_stats(db, board_id, current_user.id)
-    if board is None:
-        raise HTTPException(status_code=404, detail="Board not found")
-    return board
+    def load() -> bytes:
+        board = crud.get_board_with_stats(db, board_id, current_user.id)
+        if board is None:
+            raise HTTPException(status_code=404, detail="Board not found")
+        return schemas.BoardWithStats.model_validate(board).model_dump_json().encode()
+
+    return coalesced_read(request, current_user.id, load)
 
 
 @app.post("/api/boards", response_model=schemas.Board, status_code=status.HTTP_201_CREATED)
 def create_board(
     board: schemas.BoardCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Create a new board for the current user"""
@@ -172,7 +273,7 @@ def create_board(
 def update_board(
     board_id: int,
     board: schemas.BoardUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Update a board for the current user"""
@@ -185,10 +286,28 @@ def update_board(
 @app.delete("/api/boards/{board_id}")
 def delete_board(
     board_id: int,
-    db: Session = Depends(get_db),
+    defer: bool = False,
+    db: Session = Depends(get_shard_db),
+    primary_db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Delete a board for the current user"""
+    """Delete a board for the current user, optionally as a background job.
+
+    Deferred deletes run inline when this process isn't running jobs, so
+    they never sit in a queue nobody works.
+    """
+    if defer and job_runner.is_running:
+        if not crud.can_delete_board(db, board_id, current_user.id):
+            raise HTTPException(status_code=400, detail="Cannot delete board (last board or not found)")
+        db_job = jobs.enqueue(
+            primary_db, "delete_board", {"board_id": board_id, "user_id": current_user.id}, current_user.id
+        )
+        job_runner.notify()
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=schemas.Job.model_validate(db_job).model_dump(mode="json"),
+        )
+
     success = crud.delete_board(db, board_id, current_user.id)
     if not success:
         raise HTTPException(status_code=400, detail="Cannot delete board (last board or not found)")
@@ -199,19 +318,25 @@ def delete_board(
 @app.get("/api/boards/{board_id}/cards", response_model=List[schemas.Card])
 def get_cards_by_board(
     board_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get all kanban cards for a specific board"""
-    cards = crud.get_cards(db, board_id, current_user.id)
-    return cards
+    def load() -> bytes:
+        cards = crud.get_cards(db, board_id, current_user.id)
+        return card_list_adapter.dump_json(
+            card_list_adapter.validate_python(cards, from_attributes=True)
+        )
+
+    return coalesced_read(request, current_user.id, load)
 
 
 @app.post("/api/boards/{board_id}/cards", response_model=schemas.Card, status_code=status.HTTP_201_CREATED)
 def create_card(
     board_id: int,
     card: schemas.CardCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Create a new kanban card for a specific board"""
@@ -225,7 +350,7 @@ def create_card(
 def update_card(
     card_id: int,
     card: schemas.CardUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Update a kanban card for the current user"""
@@ -238,7 +363,7 @@ def update_card(
 @app.delete("/api/cards/{card_id}")
 def delete_card(
     card_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Delete a kanban card for the current user"""
@@ -248,7 +373,119 @@ def delete_card(
     return {"message": "Card deleted successfully"}
 
 
+# Archive Endpoints (Protected)
+@app.get("/api/boards/{board_id}/archive", response_model=List[schemas.ArchivedCard])
+def get_archived_cards(
+    board_id: int,
+    q: Optional[str] = Query(None, max_length=255),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    db: Session = Depends(get_shard_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """List or search archived cards of a board"""
+    cards = crud.get_archived_cards(db, board_id, current_user.id, q, skip, limit)
+    if cards is None:
+        raise HTTPException(status_code=404, detail="Board not found")
+    return cards
+
+
+@app.post("/api/archived-cards/{card_id}/restore", response_model=schemas.Card)
+def restore_card(
+    card_id: int,
+    db: Session = Depends(get_shard_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Restore an archived card to its board"""
+    db_card = crud.restore_card(db, card_id, current_user.id)
+    if db_card is None:
+        raise HTTPException(status_code=404, detail="Archived card not found")
+    return db_card
+
+
+# Export/Import Endpoints (Protected)
+@app.get("/api/boards/{board_id}/export")
+def export_board(
+    board_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_shard_db),
+    primary_db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Stream all cards of a board as NDJSON or CSV"""
+    board = crud.get_board(db, board_id, current_user.id)
+    if board is None:
+        raise HTTPException(status_code=404, detail="Board not found")
+
+    shard_id = shard_router.shard_for_user(primary_db, current_user.id)
+    # Hand the request's connections back before the body is streamed
+    db.close()
+    primary_db.close()
+
+    def generate():
+        # The request session is closed before the body is streamed,
+        # so the export reads through its own session
+        export_db = shard_router.session(shard_id)
+        try:
+            cards = crud.iter_board_cards(export_db, board_id, settings.EXPORT_BATCH_SIZE)
+            serialize = transfer.export_csv if format == "csv" else transfer.export_ndjson
+            yield from serialize(cards, settings.EXPORT_BATCH_SIZE)
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type=transfer.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="board-{board_id}.{format}"'},
+    )
+
+
+@app.post("/api/boards/{board_id}/import", response_model=schemas.CardImportResult, status_code=status.HTTP_201_CREATED)
+def import_board(
+    board_id: int,
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_shard_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Import cards into a board from an NDJSON or CSV upload"""
+    board = crud.get_board(db, board_id, current_user.id)
+    if board is None:
+        raise HTTPException(status_code=404, detail="Board not found")
+
+    result = schemas.CardImportResult()
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        # Undecodable uploads stop the parse and are reported on `result`
+        cards = transfer.parse_cards(stream, format, result)
+        result.imported = crud.bulk_create_cards(db, cards, board_id, settings.IMPORT_BATCH_SIZE)
+    finally:
+        stream.detach()
+        crud.user_versions.bump(current_user.id)
+    return result
+
+
+# Job Endpoints (Protected)
+@app.get("/api/jobs/{job_id}", response_model=schemas.Job)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Get the status of a background job"""
+    db_job = jobs.get_job(db, job_id, current_user.id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+
 @app.get("/api/health")
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/api/metrics")
+def get_metrics(current_user: models.User = Depends(get_current_active_user)):
+    """Request coalescing counters"""
+    return {"board_reads": board_reads.stats()}
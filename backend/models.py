@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey, Boolean, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -13,6 +13,14 @@ class CardStatus(str, enum.Enum):
     DONE = "done"
 
 
+class JobStatus(str, enum.Enum):
+    """Background job status enum"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 class User(Base):
     """User model for authentication"""
     __tablename__ = "users"
@@ -32,6 +40,42 @@ class User(Base):
         return f"<User(id={self.id}, username='{self.username}', email='{self.email}')>"
 
 
+class UserShard(Base):
+    """Shard directory entry mapping a user to the database holding their boards"""
+    __tablename__ = "user_shards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    shard_id = Column(Integer, default=0, nullable=False, index=True)
+    migrating = Column(Boolean, default=False, nullable=False)
+
+    def __repr__(self):
+        return f"<UserShard(user_id={self.user_id}, shard_id={self.shard_id})>"
+
+
+class ShardWriter(Base):
+    """A write in progress on users' data, which shard migrations wait for"""
+    __tablename__ = "shard_writers"
+
+    id = Column(Integer, primary_key=True)
+    # None for writers touching every user of a shard, like the archive job
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    started_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ShardWriter(id={self.id}, user_id={self.user_id})>"
+
+
+class IdSequence(Base):
+    """Next free board/card id shared by all shards, stored in the main database"""
+    __tablename__ = "id_sequences"
+
+    name = Column(String(50), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<IdSequence(name='{self.name}', next_id={self.next_id})>"
+
+
 class Board(Base):
     """Board model for organizing cards"""
     __tablename__ = "boards"
@@ -48,6 +92,7 @@ class Board(Base):
     # Relationships
     owner = relationship("User", back_populates="boards")
     cards = relationship("Card", back_populates="board", cascade="all, delete-orphan")
+    archived_cards = relationship("ArchivedCard", back_populates="board", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Board(id={self.id}, name='{self.name}', user_id={self.user_id})>"
@@ -56,12 +101,19 @@ class Board(Base):
 class Card(Base):
     """Kanban card model"""
     __tablename__ = "cards"
+    __table_args__ = (
+        # Serves card lookups by board, optionally narrowed by status
+        Index("ix_cards_board_id_status", "board_id", "status"),
+        # Never reuse ids on SQLite, archived cards keep theirs for restoring
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     status = Column(
-        Enum(CardStatus),
+        # Native ENUM on MariaDB, CHECK-constrained VARCHAR on SQLite
+        Enum(CardStatus, create_constraint=True),
         default=CardStatus.TODO,
         nullable=False,
         index=True
@@ -76,3 +128,62 @@ class Card(Base):
 
     def __repr__(self):
         return f"<Card(id={self.id}, title='{self.title}', status='{self.status}', board_id={self.board_id})>"
+
+
+class ArchivedCard(Base):
+    """Archived kanban card, same columns as Card plus the archive time"""
+    __tablename__ = "archived_cards"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    status = Column(
+        Enum(CardStatus, create_constraint=True),
+        default=CardStatus.TODO,
+        nullable=False
+    )
+    priority = Column(Integer, default=0)
+    board_id = Column(Integer, ForeignKey("boards.id"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    # Relationship to board
+    board = relationship("Board", back_populates="archived_cards")
+
+    def __repr__(self):
+        return f"<ArchivedCard(id={self.id}, title='{self.title}', board_id={self.board_id})>"
+
+
+class Job(Base):
+    """Durable background job queue entry, stored in the main database"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Serves the worker's "next runnable job" lookup
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(100), nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(
+        Enum(JobStatus, create_constraint=True),
+        default=JobStatus.QUEUED,
+        nullable=False
+    )
+    priority = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    run_after = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    # Lease renewed by the running process; expired leases are recovered
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, type='{self.type}', status='{self.status}')>"
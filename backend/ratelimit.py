@@ -0,0 +1,204 @@
+"""Per-user rate limiting and admission control middleware"""
+import importlib
+import json
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from backend.auth import decode_access_token
+
+
+# Auth endpoints are limited per client IP since there is no user yet
+AUTH_PATHS = ("/api/auth/login", "/api/auth/register")
+
+# Paths that are never limited
+EXEMPT_PATHS = ("/api/health",)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket parameters: `capacity` requests, refilled over `period` seconds.
+
+    A capacity of 0 means no limit.
+    """
+    capacity: int
+    period: float = 60.0
+
+    def __post_init__(self):
+        if self.capacity < 0 or self.period <= 0:
+            raise ValueError("Rate limit capacity must be >= 0 and period > 0")
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity == 0
+
+    @property
+    def refill_rate(self) -> float:
+        """Tokens added back per second"""
+        return self.capacity / self.period
+
+
+class RateLimitStore(ABC):
+    """Storage backend for token buckets.
+
+    Implementations must make `take` atomic per key. `InMemoryStore` keeps
+    buckets in this process; a shared backend (e.g. Redis) implements the
+    same method so limits hold across several app workers, and is
+    selected with the RATE_LIMIT_STORE setting.
+    """
+
+    @abstractmethod
+    def take(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        """Consume one token for `key`, returning (allowed, retry_after seconds)"""
+
+
+class InMemoryStore(RateLimitStore):
+    """Process-local token bucket store.
+
+    Also serves as the local stand-in for a shared store in tests.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        if limit.unlimited:
+            return True, 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(limit.capacity), now))
+            tokens = min(float(limit.capacity), tokens + (now - updated) * limit.refill_rate)
+
+            if tokens >= 1:
+                allowed, retry_after = True, 0.0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / limit.refill_rate
+
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._evict_idle(now, limit)
+            self._buckets[key] = (tokens, now)
+            return allowed, retry_after
+
+    def _evict_idle(self, now: float, limit: RateLimit) -> None:
+        """Drop buckets idle long enough to have refilled completely"""
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if now - updated < limit.period
+        }
+
+    def reset(self) -> None:
+        """Forget all buckets"""
+        with self._lock:
+            self._buckets.clear()
+
+
+def load_store(spec: str) -> RateLimitStore:
+    """Create the store named by a setting: "memory" or "package.module:ClassName" """
+    if spec == "memory":
+        return InMemoryStore()
+
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Invalid rate limit store {spec!r}, expected 'memory' or 'module:Class'")
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(store_class, type) and issubclass(store_class, RateLimitStore)):
+        raise ValueError(f"{spec} is not a RateLimitStore")
+    return store_class()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing per-route-class token buckets and a global concurrency cap.
+
+    Route classes:
+      - ``auth``: login/register, keyed by client IP
+      - ``read``: GET/HEAD API requests, keyed by the JWT ``sub`` (or IP if anonymous)
+      - ``write``: all other API requests, keyed like ``read``
+
+    Requests over their bucket get 429; requests arriving while
+    `max_concurrent` API requests are already in flight get 503.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[str, RateLimit],
+        store: Optional[RateLimitStore] = None,
+        max_concurrent: int = 0,
+    ):
+        self.app = app
+        self.limits = limits
+        self.store = store or InMemoryStore()
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or path in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route_class, identity = self._classify(scope)
+        limit = self.limits.get(route_class)
+        if limit is not None and not limit.unlimited:
+            allowed, retry_after = self.store.take(f"{route_class}:{identity}", limit)
+            if not allowed:
+                await self._reject(send, 429, "Rate limit exceeded", retry_after)
+                return
+
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            await self._reject(send, 503, "Server is busy, please retry", 1)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def _classify(self, scope) -> Tuple[str, str]:
+        """Return the (route class, identity) pair for a request"""
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+
+        if scope["path"] in AUTH_PATHS:
+            return "auth", f"ip:{ip}"
+
+        route_class = "read" if scope["method"] in ("GET", "HEAD") else "write"
+        username = self._token_subject(scope)
+        if username is None:
+            return route_class, f"ip:{ip}"
+        return route_class, f"user:{username}"
+
+    @staticmethod
+    def _token_subject(scope) -> Optional[str]:
+        """Extract the JWT `sub` claim from the Authorization header, if valid"""
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return None
+                payload = decode_access_token(token)
+                return payload.get("sub") if payload else None
+        return None
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str, retry_after: float) -> None:
+        """Send an error response with a Retry-After header"""
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
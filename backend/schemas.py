@@ -1,8 +1,8 @@
 from pydantic import BaseModel, Field, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 
-from backend.models import CardStatus
+from backend.models import CardStatus, JobStatus
 
 
 class CardBase(BaseModel):
@@ -37,6 +37,24 @@ class Card(CardBase):
         from_attributes = True
 
 
+class ArchivedCard(Card):
+    """Schema for archived card response"""
+    archived_at: datetime
+
+
+class CardImportError(BaseModel):
+    """Schema for a rejected record in a card import"""
+    line: int
+    detail: str
+
+
+class CardImportResult(BaseModel):
+    """Schema for card import response"""
+    imported: int = 0
+    failed: int = 0
+    errors: List[CardImportError] = []
+
+
 # Board Schemas
 class BoardBase(BaseModel):
     """Base board schema"""
@@ -78,6 +96,25 @@ class BoardWithStats(Board):
     done_count: int = 0
 
 
+# Job Schemas
+class Job(BaseModel):
+    """Schema for background job response"""
+    id: int
+    type: str
+    status: JobStatus
+    priority: int
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # User Schemas
 class UserBase(BaseModel):
     """Base user schema"""
@@ -0,0 +1,419 @@
+"""Horizontal sharding of boards and cards by user.
+
+The main database is shard 0. It owns the users table and the
+`user_shards` directory; every shard holds boards, cards and archived
+cards plus a mirrored copy of its users' rows so foreign keys hold.
+New users are placed with consistent hashing and recorded in the
+directory, users without a directory entry live on shard 0.
+
+Writes to a user's data register in `shard_writers` on the main
+database. A migration flags the user first, then waits for registered
+writes to finish; writes starting after the flag are refused.
+"""
+import argparse
+import bisect
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend import models
+from backend.auth import get_current_active_user
+from backend.config import get_settings
+from backend.database import SessionLocal, get_db, make_sessionmaker
+
+
+# Tables created on every extra shard
+SHARD_TABLES = [
+    models.User.__table__,
+    models.Board.__table__,
+    models.Card.__table__,
+    models.ArchivedCard.__table__,
+]
+
+# Tables whose ids are allocated globally, with every table sharing each id space
+ID_SPACES = {
+    models.Board.__tablename__: [models.Board],
+    models.Card.__tablename__: [models.Card, models.ArchivedCard],
+}
+
+# Ids reserved from the main database at a time by each process
+ID_BLOCK_SIZE = 100
+
+# Writer registrations older than this are leftovers of a crashed process
+WRITER_STALE_AFTER = timedelta(hours=1)
+
+
+class UserMigrating(Exception):
+    """Raised when writing to a user whose data is being moved between shards"""
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to shard ids"""
+
+    def __init__(self, shard_ids: Iterable[int], replicas: int = 100):
+        self._ring = sorted(
+            (self._hash(f"{shard_id}:{replica}"), shard_id)
+            for shard_id in shard_ids
+            for replica in range(replicas)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+    def get(self, key: str) -> int:
+        """Return the shard id owning `key`"""
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardRouter:
+    """Routes users to shard-bound sessions"""
+
+    def __init__(self, primary: sessionmaker, shard_urls: List[str]):
+        self.sessionmakers = [primary] + [make_sessionmaker(url) for url in shard_urls]
+        self.ring = HashRing(range(len(self.sessionmakers)))
+        self._id_blocks: Dict[str, range] = {}
+        self._id_lock = threading.Lock()
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.sessionmakers)
+
+    def session(self, shard_id: int) -> Session:
+        """Open a session on a shard"""
+        return self.sessionmakers[shard_id]()
+
+    def create_all(self) -> None:
+        """Create the shard tables on every extra shard"""
+        for factory in self.sessionmakers[1:]:
+            models.Base.metadata.create_all(bind=factory.kw["bind"], tables=SHARD_TABLES)
+
+    def allocate_ids(self, table: str, count: int = 1) -> List[Optional[int]]:
+        """Allocate ids for new rows of a table.
+
+        With several shards, board and card ids come from one sequence in
+        the main database so they stay unique, and stable, across shards.
+        With a single database the ids are left to autoincrement (None).
+        Call this before the session starts writing, since the sequence is
+        bumped on its own connection.
+        """
+        if self.shard_count == 1:
+            return [None] * count
+
+        with self._id_lock:
+            block = self._id_blocks.get(table, range(0))
+            if len(block) < count:
+                block = self._reserve_ids(table, max(count, ID_BLOCK_SIZE))
+            ids, self._id_blocks[table] = list(block[:count]), block[count:]
+            return ids
+
+    def _reserve_ids(self, table: str, count: int) -> range:
+        """Bump the shared sequence for `table` by `count` ids"""
+        engine = self.sessionmakers[0].kw["bind"]
+        sequence = models.IdSequence.__table__
+        while True:
+            with engine.begin() as conn:
+                bumped = conn.execute(
+                    update(sequence)
+                    .where(sequence.c.name == table)
+                    .values(next_id=sequence.c.next_id + count)
+                ).rowcount
+                if bumped:
+                    end = conn.execute(
+                        select(sequence.c.next_id).where(sequence.c.name == table)
+                    ).scalar_one()
+                    return range(end - count, end)
+
+            # First allocation: start above every id already in use
+            start = self._max_id(table) + 1
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(sequence).values(name=table, next_id=start + count))
+                return range(start, start + count)
+            except IntegrityError:
+                # Another process created the sequence first, bump it instead
+                continue
+
+    def _max_id(self, table: str) -> int:
+        """Highest id used by any table of an id space on any shard"""
+        highest = 0
+        for shard_id in range(self.shard_count):
+            db = self.session(shard_id)
+            try:
+                for model in ID_SPACES[table]:
+                    highest = max(highest, db.query(func.max(model.id)).scalar() or 0)
+            finally:
+                db.close()
+        return highest
+
+    def shard_for_user(self, db: Session, user_id: int) -> int:
+        """Look up a user's shard in the directory"""
+        entry = db.get(models.UserShard, user_id)
+        return entry.shard_id if entry is not None else 0
+
+    def assign_user(self, db: Session, user: models.User) -> int:
+        """Place a new user on a shard and record it in the directory"""
+        shard_id = self.ring.get(str(user.id))
+        db.add(models.UserShard(user_id=user.id, shard_id=shard_id))
+        db.commit()
+
+        if shard_id != 0:
+            shard_db = self.session(shard_id)
+            try:
+                mirror_user(shard_db, user)
+            finally:
+                shard_db.close()
+        return shard_id
+
+
+def mirror_user(shard_db: Session, user: models.User) -> None:
+    """Copy a user's row onto a shard so its boards' foreign keys hold"""
+    shard_db.merge(models.User(
+        id=user.id,
+        email=user.email,
+        username=user.username,
+        hashed_password=user.hashed_password,
+        is_active=user.is_active,
+    ))
+    shard_db.commit()
+
+
+@contextmanager
+def register_writer(db: Session, user_id: Optional[int]) -> Iterator[None]:
+    """Record a write in progress on the main database so migrations wait for it.
+
+    A `user_id` of None stands for every user, for jobs writing across shards.
+    """
+    writer = models.ShardWriter(user_id=user_id, started_at=datetime.utcnow())
+    db.add(writer)
+    db.flush()
+    writer_id = writer.id
+    db.commit()
+    try:
+        yield
+    finally:
+        # Discard anything the write left uncommitted before unregistering
+        db.rollback()
+        db.execute(delete(models.ShardWriter).where(models.ShardWriter.id == writer_id))
+        db.commit()
+
+
+@contextmanager
+def user_write(db: Session, user_id: int) -> Iterator[int]:
+    """Fence a write to a user's data against migrations, yielding the user's shard.
+
+    The write registers before checking the directory, so a migration
+    either sees the registration and waits for it, or has already flagged
+    the user and the write is refused with `UserMigrating`.
+    """
+    with register_writer(db, user_id):
+        entry = db.get(models.UserShard, user_id)
+        if entry is not None and entry.migrating:
+            raise UserMigrating(user_id)
+        yield entry.shard_id if entry is not None else 0
+
+
+def migrating_user_ids(db: Session) -> Set[int]:
+    """Ids of the users currently being moved between shards"""
+    return set(db.execute(
+        select(models.UserShard.user_id).where(models.UserShard.migrating.is_(True))
+    ).scalars())
+
+
+settings = get_settings()
+
+# Shard router shared by the application
+shard_router = ShardRouter(SessionLocal, settings.SHARD_URL_LIST)
+
+
+def _shard_session(db: Session, shard_id: int) -> Iterator[Session]:
+    if shard_id == 0:
+        # Reuse the main session so a request holds one connection per database
+        yield db
+        return
+
+    shard_db = shard_router.session(shard_id)
+    try:
+        yield shard_db
+    finally:
+        shard_db.close()
+
+
+def get_shard_db(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Dependency to get a session on the current user's shard.
+
+    Writes are fenced against migrations: they get 503 while the user is
+    being moved, and a migration waits for writes already under way.
+    """
+    if request.method in ("GET", "HEAD"):
+        yield from _shard_session(db, shard_router.shard_for_user(db, current_user.id))
+        return
+
+    try:
+        with user_write(db, current_user.id) as shard_id:
+            yield from _shard_session(db, shard_id)
+    except UserMigrating:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Account is being moved, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+
+
+# User migration between shards
+def _copy_user_rows(source: Session, target: Session, user_id: int, batch_size: int) -> int:
+    """Copy a user's boards, cards and archived cards in committed batches.
+
+    Rows keep their ids, which are unique across shards.
+    """
+    board_ids = source.execute(
+        select(models.Board.id).where(models.Board.user_id == user_id)
+    ).scalars().all()
+
+    copies = [
+        (models.Board.__table__, models.Board.user_id == user_id),
+        (models.Card.__table__, models.Card.board_id.in_(board_ids)),
+        (models.ArchivedCard.__table__, models.ArchivedCard.board_id.in_(board_ids)),
+    ]
+    copied = 0
+    for table, condition in copies:
+        result = source.execute(
+            select(table).where(condition).order_by(table.c.id).execution_options(yield_per=batch_size)
+        )
+        for rows in result.partitions():
+            target.execute(insert(table), [dict(row._mapping) for row in rows])
+            target.commit()
+            copied += len(rows)
+    return copied
+
+
+def _delete_user_rows(db: Session, user_id: int, include_user: bool) -> None:
+    """Delete a user's boards and cards (and mirrored user row) from a shard"""
+    board_ids = select(models.Board.id).where(models.Board.user_id == user_id)
+    db.execute(delete(models.Card).where(models.Card.board_id.in_(board_ids)))
+    db.execute(delete(models.ArchivedCard).where(models.ArchivedCard.board_id.in_(board_ids)))
+    db.execute(delete(models.Board).where(models.Board.user_id == user_id))
+    if include_user:
+        db.execute(delete(models.User).where(models.User.id == user_id))
+    db.commit()
+
+
+def _wait_for_writers(db: Session, user_id: int, timeout: float, poll_interval: float = 0.1) -> None:
+    """Wait until no registered write to the user's data is in progress"""
+    deadline = time.monotonic() + timeout
+    while True:
+        busy = db.query(models.ShardWriter).filter(
+            or_(models.ShardWriter.user_id == user_id, models.ShardWriter.user_id.is_(None)),
+            models.ShardWriter.started_at > datetime.utcnow() - WRITER_STALE_AFTER
+        ).count()
+        # End the read so the next poll sees writers that finished meanwhile
+        db.rollback()
+        if not busy:
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Writes to user {user_id} still in progress after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def migrate_user(
+    router: ShardRouter,
+    user_id: int,
+    target_shard: int,
+    batch_size: int = 1000,
+    drain_timeout: float = 300.0
+) -> int:
+    """Move a user's data to another shard while the app keeps running.
+
+    Reads keep hitting the source shard during the copy; new writes are
+    refused until the directory flips to the target shard, and writes
+    already under way are waited for, up to `drain_timeout` seconds,
+    before copying. Returns the number of rows copied.
+    """
+    if not 0 <= target_shard < router.shard_count:
+        raise ValueError(f"Unknown shard {target_shard}")
+
+    primary = router.session(0)
+    try:
+        user = primary.get(models.User, user_id)
+        if user is None:
+            raise ValueError(f"Unknown user {user_id}")
+
+        entry = primary.get(models.UserShard, user_id)
+        if entry is None:
+            entry = models.UserShard(user_id=user_id, shard_id=0)
+            primary.add(entry)
+        source_shard = entry.shard_id
+        if source_shard == target_shard:
+            return 0
+
+        entry.migrating = True
+        primary.commit()
+        try:
+            _wait_for_writers(primary, user_id, drain_timeout)
+        except TimeoutError:
+            entry.migrating = False
+            primary.commit()
+            raise
+
+        source = router.session(source_shard)
+        target = router.session(target_shard)
+        try:
+            try:
+                if target_shard != 0:
+                    mirror_user(target, user)
+                copied = _copy_user_rows(source, target, user_id, batch_size)
+            except Exception:
+                target.rollback()
+                _delete_user_rows(target, user_id, include_user=target_shard != 0)
+                entry.migrating = False
+                primary.commit()
+                raise
+
+            entry.shard_id = target_shard
+            entry.migrating = False
+            primary.commit()
+
+            _delete_user_rows(source, user_id, include_user=source_shard != 0)
+            return copied
+        finally:
+            source.close()
+            target.close()
+    finally:
+        primary.close()
+
+
+def main():
+    """Command line entry point for shard maintenance"""
+    parser = argparse.ArgumentParser(description="Manage user shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="Move a user to another shard")
+    migrate.add_argument("user_id", type=int)
+    migrate.add_argument("shard_id", type=int)
+    migrate.add_argument("--batch-size", type=int, default=1000)
+    migrate.add_argument("--drain-timeout", type=float, default=300.0,
+                         help="Seconds to wait for writes in progress before giving up")
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        shard_router.create_all()
+        copied = migrate_user(shard_router, args.user_id, args.shard_id, args.batch_size, args.drain_timeout)
+        print(f"Moved user {args.user_id} to shard {args.shard_id} ({copied} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Request coalescing for identical concurrent reads"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """An in-flight call whose result is shared with waiting callers"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time and hands its result to concurrent callers.
+
+    Callers that arrive while a call with the same key is running wait up
+    to `timeout` seconds for it, then run the function themselves. Errors
+    raised by the running call are re-raised in every waiting caller.
+    """
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"executed": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Return `fn()`, sharing the result with concurrent calls for `key`"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if leader:
+            return self._run(key, call, fn)
+
+        if not call.done.wait(self.timeout):
+            # Don't let a slow leader hold followers hostage
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return fn()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters of executed, coalesced, timed out and failed calls"""
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+class Versions:
+    """Per-key write counters to put into SingleFlight keys.
+
+    Bumping a key's version after a write commits means reads starting
+    afterwards never join a call that started before the write.
+    """
+
+    def __init__(self):
+        self._versions: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> int:
+        """Return the current version of `key`"""
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def bump(self, key: Hashable) -> None:
+        """Record a committed write to `key`"""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
@@ -0,0 +1,136 @@
+"""Streaming serialization and incremental parsing for board export/import"""
+import csv
+import io
+import json
+from typing import IO, Iterable, Iterator, Tuple, Union
+
+from pydantic import ValidationError
+
+from backend import models, schemas
+
+
+# Supported export/import formats and their media types
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Column order used for CSV exports
+EXPORT_FIELDS = ["id", "title", "description", "status", "priority", "created_at", "updated_at"]
+
+# Fields read back from an import, everything else is ignored
+IMPORT_FIELDS = ["title", "description", "status", "priority"]
+
+# Maximum number of per-line errors reported back for a single import
+MAX_REPORTED_ERRORS = 100
+
+# Card descriptions are unbounded Text, so lift the csv module's 128 KB
+# default field limit to the largest value it accepts on every platform
+csv.field_size_limit(2**31 - 1)
+
+
+def _card_to_dict(card: models.Card) -> dict:
+    """Convert a card to a JSON-compatible dict"""
+    return schemas.Card.model_validate(card).model_dump(mode="json")
+
+
+def export_ndjson(cards: Iterable[models.Card], chunk_size: int) -> Iterator[str]:
+    """Serialize cards as NDJSON, yielding one chunk per `chunk_size` cards"""
+    buffer = []
+    for card in cards:
+        buffer.append(json.dumps(_card_to_dict(card)))
+        if len(buffer) >= chunk_size:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+def export_csv(cards: Iterable[models.Card], chunk_size: int) -> Iterator[str]:
+    """Serialize cards as CSV, yielding one chunk per `chunk_size` cards"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    for card in cards:
+        writer.writerow(_card_to_dict(card))
+        rows += 1
+        if rows >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _iter_ndjson(stream: IO[str]) -> Iterator[Tuple[int, Union[dict, Exception]]]:
+    """Yield (line number, record or parse error) pairs from an NDJSON stream"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, exc
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("Expected a JSON object")
+            continue
+        yield line_number, record
+
+
+def _iter_csv(stream: IO[str]) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, record) pairs from a CSV stream with a header row"""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        # Empty CSV cells mean "not provided" so schema defaults apply
+        yield reader.line_num, {
+            key: value for key, value in record.items()
+            if key in IMPORT_FIELDS and value not in (None, "")
+        }
+
+
+def _record_error(result: schemas.CardImportResult, line: int, detail: str) -> None:
+    """Count a rejected record, keeping only the first few error details"""
+    result.failed += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(schemas.CardImportError(line=line, detail=detail))
+
+
+def parse_cards(
+    stream: IO[str],
+    format: str,
+    result: schemas.CardImportResult,
+) -> Iterator[schemas.CardCreate]:
+    """Incrementally parse and validate cards from an upload stream.
+
+    Invalid records are skipped and recorded on `result`. An upload that
+    can't be decoded or read as CSV stops the parse; the error is recorded
+    with the first line that wasn't read, so the cards before it still
+    count as imported.
+    """
+    records = _iter_csv(stream) if format == "csv" else _iter_ndjson(stream)
+    line_number = 0
+    try:
+        for line_number, record in records:
+            if isinstance(record, Exception):
+                _record_error(result, line_number, str(record))
+                continue
+            try:
+                yield schemas.CardCreate.model_validate(
+                    {key: value for key, value in record.items() if key in IMPORT_FIELDS}
+                )
+            except ValidationError as exc:
+                _record_error(result, line_number, "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                    for err in exc.errors()
+                ))
+    except UnicodeDecodeError:
+        _record_error(
+            result, line_number + 1,
+            "Upload must be UTF-8 encoded, this and later lines were not imported"
+        )
+    except csv.Error as exc:
+        _record_error(result, line_number + 1, f"Invalid CSV ({exc}), this and later lines were not imported")
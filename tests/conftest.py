@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Run the app on a throwaway SQLite database; must happen before backend is imported
+os.environ.update({
+    "DB_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(tempfile.mkdtemp(prefix="kanban-tests-"), "kanban.db"),
+    "SHARD_URLS": "",
+    "ARCHIVE_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+    "JOB_POLL_INTERVAL_SECONDS": "0.05",
+    "JOB_RETRY_BACKOFF_SECONDS": "0.05",
+})
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client running the app's startup and shutdown hooks"""
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Register a fresh user and return its Authorization header"""
+    username = f"user{uuid.uuid4().hex[:12]}"
+    client.post("/api/auth/register", json={
+        "email": f"{username}@example.com",
+        "username": username,
+        "password": "secret123",
+    })
+    response = client.post("/api/auth/login", json={"username": username, "password": "secret123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
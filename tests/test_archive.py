@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from backend import crud, models
+from backend.database import SessionLocal
+
+
+def make_board(client, headers):
+    return client.post("/api/boards", headers=headers, json={"name": "Archive"}).json()["id"]
+
+
+def add_card(client, headers, board_id, title, status="done", description=None, age_days=0):
+    card = client.post(f"/api/boards/{board_id}/cards", headers=headers, json={
+        "title": title, "status": status, "description": description,
+    }).json()
+    if age_days:
+        db = SessionLocal()
+        try:
+            db.query(models.Card).filter(models.Card.id == card["id"]).update(
+                {"updated_at": datetime.utcnow() - timedelta(days=age_days)}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+    return card["id"]
+
+
+def archive(batch_size=500):
+    """Run the archive policy with a 30 day cutoff, returning (moved, commits)"""
+    db = SessionLocal()
+    commits = []
+    commit = db.commit
+    db.commit = lambda: (commits.append(1), commit())
+    try:
+        moved = crud.archive_done_cards(db, datetime.utcnow() - timedelta(days=30), batch_size)
+    finally:
+        db.close()
+    return moved, len(commits)
+
+
+def test_archive_moves_old_done_cards_in_batches(client, auth_headers):
+    board_id = make_board(client, auth_headers)
+    old_done = [add_card(client, auth_headers, board_id, f"Old {i}", age_days=40) for i in range(5)]
+    recent = add_card(client, auth_headers, board_id, "Recent", age_days=10)
+    old_todo = add_card(client, auth_headers, board_id, "Old todo", status="todo", age_days=40)
+
+    assert archive(batch_size=2) == (5, 3)
+
+    cards = client.get(f"/api/boards/{board_id}/cards", headers=auth_headers).json()
+    assert sorted(card["id"] for card in cards) == sorted([recent, old_todo])
+    stats = client.get(f"/api/boards/{board_id}", headers=auth_headers).json()
+    assert (stats["card_count"], stats["done_count"]) == (2, 1)
+    archived = client.get(f"/api/boards/{board_id}/archive", headers=auth_headers).json()
+    assert sorted(card["id"] for card in archived) == sorted(old_done)
+    assert archive() == (0, 0)
+
+
+def test_archive_search_matches_literally(client, auth_headers):
+    board_id = make_board(client, auth_headers)
+    for title in ("100% done", "1000 done", "snake_case", "snakeXcase"):
+        add_card(client, auth_headers, board_id, title, age_days=40)
+    add_card(client, auth_headers, board_id, "Other", description="Mentions SNAKE_case", age_days=40)
+    archive()
+
+    def search(term):
+        cards = client.get(
+            f"/api/boards/{board_id}/archive", params={"q": term}, headers=auth_headers
+        ).json()
+        return sorted(card["title"] for card in cards)
+
+    assert search("100%") == ["100% done"]
+    assert search("snake_case") == ["Other", "snake_case"]
+    assert len(search("")) == 5
+
+
+def test_restore_keeps_the_original_id(client, auth_headers):
+    board_id = make_board(client, auth_headers)
+    card_id = add_card(client, auth_headers, board_id, "Bring me back", age_days=40)
+    archive()
+
+    response = client.post(f"/api/archived-cards/{card_id}/restore", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == card_id
+    cards = client.get(f"/api/boards/{board_id}/cards", headers=auth_headers).json()
+    assert [card["id"] for card in cards] == [card_id]
+    assert client.get(f"/api/boards/{board_id}/archive", headers=auth_headers).json() == []
+    # Restored cards count as touched, so the policy leaves them alone
+    assert archive() == (0, 0)
+    assert client.post(f"/api/archived-cards/{card_id}/restore", headers=auth_headers).status_code == 404
@@ -0,0 +1,29 @@
+from backend import crud
+from backend.database import SessionLocal
+
+
+def test_cards_are_listed_in_board_column_order(client, auth_headers):
+    board_id = client.post("/api/boards", headers=auth_headers, json={"name": "Order"}).json()["id"]
+    for title, status, priority in (
+        ("Done", "done", 5),
+        ("Doing", "in_progress", 0),
+        ("Later", "todo", 0),
+        ("Now", "todo", 2),
+        ("Done too", "done", 0),
+    ):
+        client.post(f"/api/boards/{board_id}/cards", headers=auth_headers, json={
+            "title": title, "status": status, "priority": priority,
+        })
+
+    cards = client.get(f"/api/boards/{board_id}/cards", headers=auth_headers).json()
+
+    assert [card["title"] for card in cards] == ["Now", "Later", "Doing", "Done", "Done too"]
+
+    # A page cut short by the limit keeps the To Do cards
+    user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+    db = SessionLocal()
+    try:
+        page = crud.get_cards(db, board_id, user_id, limit=2)
+    finally:
+        db.close()
+    assert [card.title for card in page] == ["Now", "Later"]
@@ -0,0 +1,128 @@
+import time
+from datetime import datetime, timedelta
+
+from backend import jobs, models
+from backend.database import SessionLocal
+
+
+def wait_for_job(client, headers, job_id, timeout=5):
+    """Poll a job until it finishes"""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def user_id(client, headers):
+    return client.get("/api/auth/me", headers=headers).json()["id"]
+
+
+def test_deferred_board_delete(client, auth_headers):
+    board_id = client.post("/api/boards", headers=auth_headers, json={"name": "Old"}).json()["id"]
+
+    response = client.delete(f"/api/boards/{board_id}?defer=true", headers=auth_headers)
+
+    assert response.status_code == 202
+    job = wait_for_job(client, auth_headers, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"deleted": True}
+    assert client.get(f"/api/boards/{board_id}", headers=auth_headers).status_code == 404
+
+
+def test_failed_delete_records_reason_without_retrying(client, auth_headers):
+    db = SessionLocal()
+    try:
+        db_job = jobs.enqueue(
+            db, "delete_board", {"board_id": 999999, "user_id": user_id(client, auth_headers)},
+            user_id(client, auth_headers)
+        )
+    finally:
+        db.close()
+
+    job = wait_for_job(client, auth_headers, db_job.id)
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Board not found"
+    assert job["attempts"] == 1
+
+
+def test_deferred_delete_runs_inline_without_job_runner(client, auth_headers, monkeypatch):
+    from backend import main
+
+    stopped = jobs.JobRunner(SessionLocal, workers=1, poll_interval=1, retry_backoff=1, lease=timedelta(seconds=60))
+    monkeypatch.setattr(main, "job_runner", stopped)
+    board_id = client.post("/api/boards", headers=auth_headers, json={"name": "Old"}).json()["id"]
+
+    response = client.delete(f"/api/boards/{board_id}?defer=true", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert client.get(f"/api/boards/{board_id}", headers=auth_headers).status_code == 404
+
+
+def test_expired_leases_are_requeued_or_failed():
+    runner = jobs.JobRunner(SessionLocal, workers=1, poll_interval=1, retry_backoff=1, lease=timedelta(seconds=60))
+    expired = datetime.utcnow() - timedelta(minutes=5)
+    db = SessionLocal()
+    try:
+        # An unregistered type, so the app's runner leaves these alone
+        rows = [
+            models.Job(type="lease_test", payload={}, status=models.JobStatus.RUNNING, attempts=attempts,
+                       max_attempts=3, run_after=expired, started_at=expired, heartbeat_at=heartbeat)
+            for attempts, heartbeat in ((1, expired), (3, expired), (1, datetime.utcnow()))
+        ]
+        db.add_all(rows)
+        db.commit()
+        retried, exhausted, alive = (row.id for row in rows)
+
+        assert runner.recover_expired() == 2
+
+        db.expire_all()
+        assert db.get(models.Job, retried).status == models.JobStatus.QUEUED
+        assert db.get(models.Job, exhausted).status == models.JobStatus.FAILED
+        assert db.get(models.Job, exhausted).error == "Job lease expired"
+        assert db.get(models.Job, alive).status == models.JobStatus.RUNNING
+    finally:
+        db.query(models.Job).filter(models.Job.type == "lease_test").delete()
+        db.commit()
+        db.close()
+
+
+def set_migrating(user_id, migrating):
+    db = SessionLocal()
+    try:
+        db.get(models.UserShard, user_id).migrating = migrating
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_delete_waits_while_user_is_migrating(client, auth_headers):
+    board_id = client.post("/api/boards", headers=auth_headers, json={"name": "Old"}).json()["id"]
+    owner_id = user_id(client, auth_headers)
+    set_migrating(owner_id, True)
+    try:
+        db = SessionLocal()
+        try:
+            job_id = jobs.enqueue(db, "delete_board", {"board_id": board_id, "user_id": owner_id}, owner_id).id
+        finally:
+            db.close()
+
+        deadline = time.monotonic() + 5
+        while client.get(f"/api/jobs/{job_id}", headers=auth_headers).json()["error"] is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        job = client.get(f"/api/jobs/{job_id}", headers=auth_headers).json()
+
+        assert job["status"] in ("queued", "running")
+        assert job["error"] == "User is being moved between shards"
+        assert job["attempts"] <= 1
+        assert client.get(f"/api/boards/{board_id}", headers=auth_headers).status_code == 200
+    finally:
+        set_migrating(owner_id, False)
+
+    job = wait_for_job(client, auth_headers, job_id)
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 1
+    assert client.get(f"/api/boards/{board_id}", headers=auth_headers).status_code == 404
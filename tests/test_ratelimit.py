@@ -0,0 +1,145 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import ratelimit
+from backend.auth import create_access_token
+from backend.ratelimit import InMemoryStore, RateLimit, RateLimitMiddleware, RateLimitStore, load_store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", fake)
+    return fake
+
+
+def make_client(limits, store=None, max_concurrent=0, release=None, entered=None):
+    """Client for a small app behind the middleware"""
+    app = FastAPI()
+
+    @app.get("/api/items")
+    def read_items():
+        return []
+
+    @app.post("/api/items")
+    def create_item():
+        return {}
+
+    @app.post("/api/auth/login")
+    def login():
+        return {}
+
+    @app.get("/api/health")
+    def health():
+        return {"status": "healthy"}
+
+    @app.get("/api/slow")
+    def slow():
+        entered.set()
+        release.wait(5)
+        return {}
+
+    app.add_middleware(RateLimitMiddleware, limits=limits, store=store, max_concurrent=max_concurrent)
+    return TestClient(app)
+
+
+def bearer(username):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def test_bucket_allows_capacity_then_refills(clock):
+    store = InMemoryStore()
+    limit = RateLimit(2, period=60)
+
+    assert store.take("k", limit) == (True, 0.0)
+    assert store.take("k", limit) == (True, 0.0)
+    allowed, retry_after = store.take("k", limit)
+    assert not allowed
+    assert retry_after == pytest.approx(30)
+
+    clock.now += 30
+    assert store.take("k", limit)[0]
+    assert not store.take("k", limit)[0]
+
+
+def test_zero_capacity_means_no_limit(clock):
+    store = InMemoryStore()
+    limit = RateLimit(0)
+
+    assert all(store.take("k", limit) == (True, 0.0) for _ in range(100))
+
+
+def test_negative_capacity_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimit(-1)
+
+
+def test_store_must_implement_take():
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+def test_load_store():
+    assert isinstance(load_store("memory"), InMemoryStore)
+    assert isinstance(load_store("backend.ratelimit:InMemoryStore"), InMemoryStore)
+    with pytest.raises(ValueError):
+        load_store("backend.ratelimit")
+    with pytest.raises(ValueError):
+        load_store("backend.ratelimit:RateLimit")
+
+
+def test_over_limit_gets_429_with_retry_after(clock):
+    client = make_client({"read": RateLimit(60), "write": RateLimit(2)})
+
+    assert client.post("/api/items", headers=bearer("alice")).status_code == 200
+    assert client.post("/api/items", headers=bearer("alice")).status_code == 200
+    response = client.post("/api/items", headers=bearer("alice"))
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    # Other users and route classes have their own buckets
+    assert client.post("/api/items", headers=bearer("bob")).status_code == 200
+    assert client.get("/api/items", headers=bearer("alice")).status_code == 200
+
+
+def test_auth_limited_by_ip_and_health_exempt(clock):
+    client = make_client({"auth": RateLimit(1), "read": RateLimit(1)})
+
+    assert client.post("/api/auth/login").status_code == 200
+    assert client.post("/api/auth/login").status_code == 429
+    assert all(client.get("/api/health").status_code == 200 for _ in range(5))
+
+
+def test_zero_limit_in_middleware_does_not_fail(clock):
+    client = make_client({"read": RateLimit(0)})
+
+    assert all(client.get("/api/items").status_code == 200 for _ in range(5))
+
+
+def test_over_concurrency_cap_gets_503():
+    entered, release = threading.Event(), threading.Event()
+    client = make_client({}, max_concurrent=1, entered=entered, release=release)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        slow = pool.submit(client.get, "/api/slow")
+        assert entered.wait(5)
+        response = client.get("/api/items")
+        release.set()
+        assert slow.result().status_code == 200
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/api/items").status_code == 200
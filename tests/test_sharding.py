@@ -0,0 +1,251 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from backend import models
+from backend.archive import ArchiveScheduler
+from backend.database import SessionLocal, make_sessionmaker
+from backend.sharding import ShardRouter, UserMigrating, get_shard_db, migrate_user, user_write
+
+
+@pytest.fixture
+def router(tmp_path):
+    """A router over a main database and two extra SQLite shards"""
+    primary = make_sessionmaker(f"sqlite:///{tmp_path}/primary.db")
+    models.Base.metadata.create_all(bind=primary.kw["bind"])
+    shard_router = ShardRouter(primary, [f"sqlite:///{tmp_path}/shard{i}.db" for i in (1, 2)])
+    shard_router.create_all()
+    return shard_router
+
+
+def add_user(router, name):
+    primary = router.session(0)
+    try:
+        user = models.User(email=f"{name}@example.com", username=name, hashed_password="x")
+        primary.add(user)
+        primary.commit()
+        primary.refresh(user)
+        return user.id, router.assign_user(primary, user)
+    finally:
+        primary.close()
+
+
+def add_board(router, user_id, shard_id, card_count=3):
+    db = router.session(shard_id)
+    try:
+        board_id = router.allocate_ids("boards")[0]
+        db.add(models.Board(id=board_id, name="Board", user_id=user_id))
+        for card_id in router.allocate_ids("cards", card_count):
+            db.add(models.Card(id=card_id, title=f"Card {card_id}", board_id=board_id))
+        db.commit()
+        return board_id
+    finally:
+        db.close()
+
+
+def test_users_are_spread_over_shards_and_mirrored(router):
+    placements = [add_user(router, f"user{i}") for i in range(12)]
+
+    assert {shard_id for _, shard_id in placements} == {0, 1, 2}
+    primary = router.session(0)
+    for user_id, shard_id in placements:
+        assert router.shard_for_user(primary, user_id) == shard_id
+        if shard_id != 0:
+            shard_db = router.session(shard_id)
+            assert shard_db.get(models.User, user_id) is not None
+            shard_db.close()
+    primary.close()
+
+
+def test_allocated_ids_are_unique_across_processes(router):
+    # A second router over the same databases stands in for another process
+    other = ShardRouter(router.sessionmakers[0], [])
+    other.sessionmakers = router.sessionmakers
+
+    ids = router.allocate_ids("cards", 150) + other.allocate_ids("cards", 150) + router.allocate_ids("cards", 5)
+
+    assert len(set(ids)) == len(ids)
+
+
+def test_allocation_starts_above_existing_ids(router):
+    user_id, shard_id = add_user(router, "legacy")
+    db = router.session(shard_id)
+    db.add(models.Board(id=500, name="Legacy", user_id=user_id))
+    db.commit()
+    db.close()
+
+    assert router.allocate_ids("boards")[0] == 501
+
+
+def test_migrate_user_keeps_ids(router):
+    user_id, source = add_user(router, "mover")
+    board_id = add_board(router, user_id, source)
+    db = router.session(source)
+    archived_id = router.allocate_ids("cards")[0]
+    db.add(models.ArchivedCard(id=archived_id, title="Old", board_id=board_id, status=models.CardStatus.DONE))
+    db.commit()
+    card_ids = sorted(card.id for card in db.query(models.Card).filter(models.Card.board_id == board_id))
+    db.close()
+    target = (source + 1) % router.shard_count
+
+    copied = migrate_user(router, user_id, target, batch_size=2)
+
+    assert copied == 1 + len(card_ids) + 1
+    primary = router.session(0)
+    entry = primary.get(models.UserShard, user_id)
+    assert (entry.shard_id, entry.migrating) == (target, False)
+    primary.close()
+
+    db = router.session(target)
+    assert db.get(models.Board, board_id).user_id == user_id
+    assert sorted(card.id for card in db.query(models.Card).filter(models.Card.board_id == board_id)) == card_ids
+    assert db.get(models.ArchivedCard, archived_id) is not None
+    db.close()
+
+    db = router.session(source)
+    assert db.query(models.Board).filter(models.Board.user_id == user_id).count() == 0
+    assert db.query(models.Card).filter(models.Card.id.in_(card_ids)).count() == 0
+    db.close()
+
+
+def test_get_shard_db_reuses_main_session_on_shard_zero(client):
+    db = SessionLocal()
+    user = models.User(email="shardzero@example.com", username="shardzero", hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    dependency = get_shard_db(SimpleNamespace(method="GET"), db, user)
+    assert next(dependency) is db
+    with pytest.raises(StopIteration):
+        next(dependency)
+    db.close()
+
+
+def user_on_shard_zero(router, name):
+    """Add users until one lands on shard 0, so main and shard sessions share a database"""
+    for i in range(50):
+        user_id, shard_id = add_user(router, f"{name}{i}")
+        if shard_id == 0:
+            return user_id
+    raise AssertionError("No user was placed on shard 0")
+
+
+def set_migrating(router, user_id, migrating=True):
+    primary = router.session(0)
+    entry = primary.get(models.UserShard, user_id)
+    entry.migrating = migrating
+    primary.commit()
+    primary.close()
+
+
+def directory_entry(router, user_id):
+    """The user's (shard id, migrating) pair"""
+    primary = router.session(0)
+    entry = primary.get(models.UserShard, user_id)
+    primary.close()
+    return entry.shard_id, entry.migrating
+
+
+def writer_count(router):
+    primary = router.session(0)
+    count = primary.query(models.ShardWriter).count()
+    primary.close()
+    return count
+
+
+@pytest.mark.parametrize("on_shard_zero", [False, True])
+def test_migration_waits_for_writes_in_progress(router, on_shard_zero):
+    if on_shard_zero:
+        user_id, source = user_on_shard_zero(router, "zero"), 0
+    else:
+        user_id, source = add_user(router, "writer")
+    board_id = add_board(router, user_id, source)
+    target = (source + 1) % router.shard_count
+    primary = router.session(0)
+    migration = {}
+
+    def migrate():
+        migration["copied"] = migrate_user(router, user_id, target, drain_timeout=10)
+
+    with user_write(primary, user_id) as shard_id:
+        assert shard_id == source
+        thread = threading.Thread(target=migrate)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not directory_entry(router, user_id)[1] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # The write lands after the migration started, before the copy
+        db = router.session(source)
+        late_card_id = router.allocate_ids("cards")[0]
+        db.add(models.Card(id=late_card_id, title="Late", board_id=board_id))
+        db.commit()
+        db.close()
+        time.sleep(0.3)
+        assert thread.is_alive()
+    thread.join(10)
+    primary.close()
+
+    assert migration["copied"] == 1 + 3 + 1
+    db = router.session(target)
+    assert db.get(models.Card, late_card_id) is not None
+    db.close()
+    db = router.session(source)
+    assert db.get(models.Card, late_card_id) is None
+    db.close()
+    assert writer_count(router) == 0
+
+
+def test_writes_are_refused_while_migrating(router):
+    user_id, _ = add_user(router, "refused")
+    set_migrating(router, user_id)
+
+    primary = router.session(0)
+    with pytest.raises(UserMigrating):
+        with user_write(primary, user_id):
+            pass
+    primary.close()
+
+    assert writer_count(router) == 0
+
+
+def test_migration_gives_up_when_writes_do_not_finish(router):
+    user_id, source = add_user(router, "busy")
+    target = (source + 1) % router.shard_count
+    primary = router.session(0)
+
+    with user_write(primary, user_id):
+        with pytest.raises(TimeoutError):
+            migrate_user(router, user_id, target, drain_timeout=0.2)
+    primary.close()
+
+    assert directory_entry(router, user_id) == (source, False)
+
+
+def test_archive_skips_users_being_migrated(router):
+    old = datetime.utcnow() - timedelta(days=40)
+    boards = {}
+    for name in ("staying", "moving"):
+        user_id, shard_id = add_user(router, name)
+        board_id = add_board(router, user_id, shard_id, card_count=2)
+        db = router.session(shard_id)
+        db.query(models.Card).filter(models.Card.board_id == board_id).update(
+            {"status": models.CardStatus.DONE, "updated_at": old}, synchronize_session=False
+        )
+        db.commit()
+        db.close()
+        boards[name] = (user_id, shard_id, board_id)
+    set_migrating(router, boards["moving"][0])
+
+    scheduler = ArchiveScheduler(router.sessionmakers, after_days=30, batch_size=10, interval=60)
+
+    assert scheduler.run_once() == 2
+    for name, archived in (("staying", 2), ("moving", 0)):
+        _, shard_id, board_id = boards[name]
+        db = router.session(shard_id)
+        assert db.query(models.ArchivedCard).filter(models.ArchivedCard.board_id == board_id).count() == archived
+        db.close()
+    assert writer_count(router) == 0
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import crud
+from backend.singleflight import SingleFlight, Versions
+
+
+def blocking(release, result="result", calls=None):
+    """A function that waits for `release`, counting its calls"""
+    def fn():
+        if calls is not None:
+            calls.append(1)
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fn
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "key", blocking(release, calls=calls))
+        wait_until(lambda: flight.stats()["in_flight"] == 1)
+        followers = [pool.submit(flight.do, "key", blocking(release, calls=calls)) for _ in range(3)]
+        wait_until(lambda: flight.stats()["coalesced"] == 3)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "coalesced": 3, "timeouts": 0, "errors": 0, "in_flight": 0}
+
+
+def test_slow_leader_times_out_followers():
+    flight, release = SingleFlight(timeout=0.05), threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "key", blocking(release, "leader"))
+        wait_until(lambda: flight.stats()["in_flight"] == 1)
+        # The follower gives up waiting and runs its own function
+        assert flight.do("key", lambda: "follower") == "follower"
+        release.set()
+        assert leader.result() == "leader"
+
+    assert flight.stats()["timeouts"] == 1
+
+
+def test_errors_reach_every_waiting_caller():
+    flight, release = SingleFlight(), threading.Event()
+    error = ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", blocking(release, error))
+        wait_until(lambda: flight.stats()["in_flight"] == 1)
+        follower = pool.submit(flight.do, "key", blocking(release))
+        wait_until(lambda: flight.stats()["coalesced"] == 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+    assert flight.stats()["errors"] == 1
+    # A failed call is not cached
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_versions():
+    versions = Versions()
+
+    assert versions.get("a") == 0
+    versions.bump("a")
+    versions.bump("a")
+    assert (versions.get("a"), versions.get("b")) == (2, 0)
+
+
+def test_read_after_write_does_not_join_an_earlier_read(client, auth_headers, monkeypatch):
+    board_id = client.get("/api/boards", headers=auth_headers).json()[0]["id"]
+    card = client.post(f"/api/boards/{board_id}/cards", headers=auth_headers, json={"title": "Card"}).json()
+    loaded, release = threading.Event(), threading.Event()
+    get_cards = crud.get_cards
+
+    def slow_first_read(*args, **kwargs):
+        cards = get_cards(*args, **kwargs)
+        if not loaded.is_set():
+            loaded.set()
+            release.wait(5)
+        return cards
+
+    monkeypatch.setattr(crud, "get_cards", slow_first_read)
+    url = f"/api/boards/{board_id}/cards"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        early = pool.submit(client.get, url, headers=auth_headers)
+        assert loaded.wait(5)
+        client.put(f"/api/cards/{card['id']}", headers=auth_headers, json={"status": "done"})
+        late = client.get(url, headers=auth_headers)
+        release.set()
+        early = early.result()
+
+    assert [c["status"] for c in early.json()] == ["todo"]
+    assert [c["status"] for c in late.json()] == ["done"]
+
+
+def test_metrics(client, auth_headers):
+    assert client.get("/api/metrics").status_code == 401
+
+    stats = client.get("/api/metrics", headers=auth_headers).json()["board_reads"]
+
+    assert set(stats) == {"executed", "coalesced", "timeouts", "errors", "in_flight"}
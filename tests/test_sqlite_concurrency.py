@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+# More concurrent requests than connections the old 4+10 read pool could hand out
+CONCURRENT_REQUESTS = 32
+
+
+def run_concurrently(request, count=CONCURRENT_REQUESTS):
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        responses = list(pool.map(lambda _: request(), range(count)))
+    return responses, time.monotonic() - started
+
+
+def test_concurrent_reads_do_not_stall(client, auth_headers):
+    board_id = client.get("/api/boards", headers=auth_headers).json()[0]["id"]
+    client.post(f"/api/boards/{board_id}/cards", headers=auth_headers, json={"title": "Card"})
+
+    responses, elapsed = run_concurrently(
+        lambda: client.get(f"/api/boards/{board_id}/cards", headers=auth_headers)
+    )
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_REQUESTS
+    assert elapsed < 10
+
+
+def test_concurrent_writes_do_not_stall(client, auth_headers):
+    board_id = client.get("/api/boards", headers=auth_headers).json()[0]["id"]
+
+    responses, elapsed = run_concurrently(
+        lambda: client.post(f"/api/boards/{board_id}/cards", headers=auth_headers, json={"title": "Card"})
+    )
+
+    assert [r.status_code for r in responses] == [201] * CONCURRENT_REQUESTS
+    assert elapsed < 10
+    cards = client.get(f"/api/boards/{board_id}/cards", headers=auth_headers).json()
+    assert len(cards) == CONCURRENT_REQUESTS
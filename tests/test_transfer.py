@@ -0,0 +1,125 @@
+import csv
+
+
+def first_board(client, headers):
+    return client.get("/api/boards", headers=headers).json()[0]["id"]
+
+
+def upload(client, headers, board_id, body, format="ndjson"):
+    return client.post(
+        f"/api/boards/{board_id}/import?format={format}",
+        headers=headers,
+        files={"file": (f"cards.{format}", body)},
+    )
+
+
+def test_undecodable_upload_reports_partial_import(client, auth_headers):
+    board_id = first_board(client, auth_headers)
+    lines = [b'{"title": "Card %d"}' % i for i in range(3000)]
+    lines[2990] = b'{"title": "Bad \xff byte"}'
+
+    response = upload(client, auth_headers, board_id, b"\n".join(lines) + b"\n")
+
+    assert response.status_code == 201
+    result = response.json()
+    assert result["imported"] > 0
+    assert result["failed"] == 1
+    assert "UTF-8" in result["errors"][0]["detail"]
+    # Everything reported as imported was committed, and nothing else
+    cards = client.get(f"/api/boards/{board_id}", headers=auth_headers).json()
+    assert cards["card_count"] == result["imported"]
+    assert result["errors"][0]["line"] == result["imported"] + 1
+
+
+def make_board(client, headers, name="Import target"):
+    return client.post("/api/boards", headers=headers, json={"name": name}).json()["id"]
+
+
+def card_fields(client, headers, board_id):
+    cards = client.get(f"/api/boards/{board_id}/cards", headers=headers).json()
+    return sorted(
+        (card["title"], card["description"], card["status"], card["priority"]) for card in cards
+    )
+
+
+def seed_cards(client, headers, board_id):
+    for card in (
+        {"title": "Plain"},
+        {"title": "Quoted, \"comma\"", "description": "Line one\nline two", "status": "in_progress"},
+        {"title": "Huge", "description": "x" * 200_000, "status": "done", "priority": 3},
+    ):
+        client.post(f"/api/boards/{board_id}/cards", headers=headers, json=card)
+
+
+def test_export_import_round_trip(client, auth_headers):
+    source = first_board(client, auth_headers)
+    seed_cards(client, auth_headers, source)
+
+    for format in ("ndjson", "csv"):
+        exported = client.get(f"/api/boards/{source}/export?format={format}", headers=auth_headers)
+        assert exported.status_code == 200
+        assert exported.headers["content-type"].startswith(
+            "text/csv" if format == "csv" else "application/x-ndjson"
+        )
+
+        target = make_board(client, auth_headers)
+        response = upload(client, auth_headers, target, exported.content, format)
+
+        assert response.status_code == 201
+        assert response.json() == {"imported": 3, "failed": 0, "errors": []}
+        assert card_fields(client, auth_headers, target) == card_fields(client, auth_headers, source)
+
+
+def test_rejected_lines_are_reported(client, auth_headers):
+    board_id = make_board(client, auth_headers)
+    body = "\n".join([
+        '{"title": "Good"}',
+        "not json",
+        "[1, 2]",
+        '{"title": ""}',
+        "",
+        '{"title": "Bad status", "status": "later"}',
+        '{"title": "Also good", "status": "done"}',
+    ])
+
+    result = upload(client, auth_headers, board_id, body).json()
+
+    assert result["imported"] == 2
+    assert result["failed"] == 4
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4, 6]
+    assert card_fields(client, auth_headers, board_id) == [
+        ("Also good", None, "done", 0), ("Good", None, "todo", 0)
+    ]
+
+
+def test_csv_rejected_rows_are_reported(client, auth_headers):
+    board_id = make_board(client, auth_headers)
+    body = "title,status,priority\nGood,todo,1\n,todo,1\nBad priority,todo,-1\n"
+
+    result = upload(client, auth_headers, board_id, body, "csv").json()
+
+    assert result["imported"] == 1
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+
+
+def test_unreadable_csv_stops_the_import(client, auth_headers):
+    board_id = make_board(client, auth_headers)
+    # Trip the reader on the second row
+    limit = csv.field_size_limit(20)
+    try:
+        body = "title,description\nShort,ok\nLong,%s\nAfter,ok\n" % ("x" * 50)
+        response = upload(client, auth_headers, board_id, body, "csv")
+    finally:
+        csv.field_size_limit(limit)
+
+    assert response.status_code == 201
+    result = response.json()
+    assert result["imported"] == 1
+    assert result["failed"] == 1
+    assert result["errors"][0]["line"] == 3
+    assert "Invalid CSV" in result["errors"][0]["detail"]
+
+
+def test_export_and_import_of_unknown_board_return_404(client, auth_headers):
+    assert client.get("/api/boards/999999/export", headers=auth_headers).status_code == 404
+    assert upload(client, auth_headers, 999999, b'{"title": "Card"}\n').status_code == 404